@@ -0,0 +1,391 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from database import Database, DB_FILE
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_READERS = 4
+MAX_WRITE_BATCH = 500
+EXPORT_CHUNK_ROWS = 500
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def task_to_dict(row):
+    date_str, text, done, cat, prio = row
+    return {"date": date_str, "text": text, "done": bool(done),
+            "category": cat, "priority": prio}
+
+
+class ReaderPool:
+    def __init__(self, db_file, size):
+        self.executor = ThreadPoolExecutor(max_workers=size,
+                                           thread_name_prefix="reader")
+        self.queue = asyncio.Queue()
+        for _ in range(size):
+            self.queue.put_nowait(Database(db_file, check_same_thread=False))
+
+    async def run(self, func, *args):
+        db = await self.queue.get()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, db, *args)
+        finally:
+            self.queue.put_nowait(db)
+
+    async def acquire(self):
+        return await self.queue.get()
+
+    def release(self, db):
+        self.queue.put_nowait(db)
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait().conn.close()
+        self.executor.shutdown(wait=False)
+
+
+class BatchWriter:
+    def __init__(self, db_file):
+        self.db = Database(db_file, check_same_thread=False)
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix="writer")
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def submit(self, kind, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, rows, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self.queue.get()]
+            while len(jobs) < MAX_WRITE_BATCH and not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+            for kind in ("add", "done"):
+                group = [job for job in jobs if job[0] == kind]
+                if not group:
+                    continue
+                batches = [job_rows for _, job_rows, _ in group]
+                func = (self.db.add_tasks if kind == "add"
+                        else self.db.update_tasks_done)
+                try:
+                    counts = await loop.run_in_executor(self.executor, func,
+                                                        batches)
+                except Exception:
+                    await self.run_one_by_one(func, group)
+                else:
+                    for (_, _, future), count in zip(group, counts):
+                        if not future.done():
+                            future.set_result(count)
+
+    async def run_one_by_one(self, func, group):
+        loop = asyncio.get_running_loop()
+        for _, job_rows, future in group:
+            try:
+                counts = await loop.run_in_executor(self.executor, func,
+                                                    [job_rows])
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(counts[0])
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+        self.db.conn.close()
+
+
+class ApiServer:
+    def __init__(self, db_file=DB_FILE, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 readers=DEFAULT_READERS):
+        self.db_file = db_file
+        self.host = host
+        self.port = port
+        self.readers_count = readers
+        self.writer = None
+        self.readers = None
+        self.server = None
+
+    async def start(self):
+        self.writer = BatchWriter(self.db_file)
+        self.writer.start()
+        self.readers = ReaderPool(self.db_file, self.readers_count)
+        self.server = await asyncio.start_server(self.handle_client,
+                                                 self.host, self.port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.writer is not None:
+            await self.writer.close()
+        if self.readers is not None:
+            self.readers.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, HttpError):
+                    await self.send_json(writer, request.status,
+                                         {"error": request.message}, False)
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self.dispatch(writer, method, path, query, body,
+                                        keep_alive)
+                except ConnectionError:
+                    raise
+                except HttpError as e:
+                    await self.send_json(writer, e.status,
+                                         {"error": e.message}, keep_alive)
+                except Exception as e:
+                    await self.send_json(writer, 500, {"error": str(e)},
+                                         keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            return None
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            return HttpError(400, "invalid Content-Length")
+        if length < 0:
+            return HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            return HttpError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return method.upper(), url.path, query, headers, body
+
+    async def dispatch(self, writer, method, path, query, body, keep_alive):
+        routes = {
+            ("GET", "/tasks"): self.get_tasks,
+            ("POST", "/tasks"): self.add_tasks,
+            ("PATCH", "/tasks"): self.update_tasks,
+            ("GET", "/search"): self.search,
+            ("GET", "/stats"): self.stats,
+        }
+        if (method, path) == ("GET", "/export"):
+            await self.export(writer, query, keep_alive)
+            return
+        handler = routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in routes):
+                raise HttpError(405, "method not allowed")
+            raise HttpError(404, "not found")
+        result = await handler(query, body)
+        await self.send_json(writer, 200, result, keep_alive)
+
+    def require(self, params, name):
+        value = params.get(name)
+        if not value:
+            raise HttpError(400, f"missing '{name}'")
+        return value
+
+    def parse_body(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "invalid JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "JSON object expected")
+        return payload
+
+    async def get_tasks(self, query, body):
+        username = self.require(query, "user")
+        date_str = self.require(query, "date")
+        rows = await self.readers.run(
+            lambda db: db.get_tasks_for_date(username, date_str))
+        return [{"text": text, "done": bool(done), "category": cat,
+                 "priority": prio} for text, done, cat, prio in rows]
+
+    async def search(self, query, body):
+        username = self.require(query, "user")
+        q = self.require(query, "q")
+        rows = await self.readers.run(
+            lambda db: db.search_tasks(username, q))
+        return [task_to_dict(row) for row in rows]
+
+    async def stats(self, query, body):
+        username = self.require(query, "user")
+        total_tasks, done_tasks = await self.readers.run(
+            lambda db: db.get_stats(username))
+        return {"total": total_tasks, "done": done_tasks}
+
+    def task_list(self, payload):
+        tasks = payload.get("tasks", [])
+        if not isinstance(tasks, list) or not all(
+                isinstance(task, dict) for task in tasks):
+            raise HttpError(400, "'tasks' must be a list of objects")
+        return tasks
+
+    def check_strings(self, task, fields):
+        for field in fields:
+            if task.get(field) is not None and not isinstance(task[field], str):
+                raise HttpError(400, f"'{field}' must be a string")
+
+    async def submit(self, kind, rows):
+        try:
+            return await self.writer.submit(kind, rows)
+        except sqlite3.IntegrityError as e:
+            raise HttpError(400, str(e))
+
+    async def add_tasks(self, query, body):
+        payload = self.parse_body(body)
+        username = self.require(payload, "user")
+        rows = []
+        for task in self.task_list(payload):
+            if not task.get("date") or not task.get("text"):
+                raise HttpError(400, "each task needs 'date' and 'text'")
+            self.check_strings(task, ("date", "text", "category", "priority"))
+            rows.append((username, task["date"], task["text"],
+                         1 if task.get("done") else 0,
+                         task.get("category") or "Все категории",
+                         task.get("priority") or "Низкий"))
+        added = await self.submit("add", rows) if rows else 0
+        return {"added": added}
+
+    async def update_tasks(self, query, body):
+        payload = self.parse_body(body)
+        username = self.require(payload, "user")
+        rows = []
+        for task in self.task_list(payload):
+            self.check_strings(task, ("date", "text", "category", "priority"))
+            try:
+                rows.append((1 if task["done"] else 0, username,
+                             task["date"], task["text"], task["category"],
+                             task["priority"]))
+            except KeyError as e:
+                raise HttpError(400, f"missing {e} in task")
+        updated = await self.submit("done", rows) if rows else 0
+        return {"updated": updated}
+
+    async def export(self, writer, query, keep_alive):
+        username = self.require(query, "user")
+        writer.write(self.status_line(200, [
+            ("Content-Type", "application/x-ndjson; charset=utf-8"),
+            ("Transfer-Encoding", "chunked"),
+            ("Connection", "keep-alive" if keep_alive else "close"),
+        ]))
+        db = await self.readers.acquire()
+        try:
+            await self.stream_tasks(writer, db, username)
+        except Exception as e:
+            raise ConnectionError("export aborted") from e
+        finally:
+            self.readers.release(db)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def stream_tasks(self, writer, db, username):
+        loop = asyncio.get_running_loop()
+        cur = await loop.run_in_executor(self.readers.executor,
+                                         db.iter_tasks, username)
+        while True:
+            rows = await loop.run_in_executor(
+                self.readers.executor, cur.fetchmany, EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            chunk = "".join(
+                json.dumps(task_to_dict(row), ensure_ascii=False) + "\n"
+                for row in rows).encode("utf-8")
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()
+
+    def status_line(self, status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(self.status_line(status, [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+            ("Connection", "keep-alive" if keep_alive else "close"),
+        ]) + body)
+        await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Локальный JSON API для базы ежедневника")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS)
+    args = parser.parse_args()
+    server = ApiServer(args.db, args.host, args.port, args.readers)
+    print(f"API: http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
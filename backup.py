@@ -0,0 +1,171 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import DB_FILE
+
+BACKUP_DIR = "backups"
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.01
+BACKUP_KEEP = 7
+SNAPSHOT_PREFIX = "diary-"
+MIGRATION_SNAPSHOT_PREFIX = "before-migration-"
+SNAPSHOT_SUFFIX = ".db"
+
+
+class BackupReport:
+    def __init__(self, path, pages_per_step):
+        self.path = path
+        self.pages_per_step = pages_per_step
+        self.total_pages = 0
+        self.step_times = []
+        self.elapsed = 0.0
+        self.error = None
+
+    def max_step(self):
+        return max(self.step_times) if self.step_times else 0.0
+
+    def mean_step(self):
+        if not self.step_times:
+            return 0.0
+        return sum(self.step_times) / len(self.step_times)
+
+    def percentile_step(self, p):
+        if not self.step_times:
+            return 0.0
+        ordered = sorted(self.step_times)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def summary(self):
+        if self.error is not None:
+            return f"Ошибка резервного копирования: {self.error}"
+        return (f"{self.path}: {self.total_pages} стр., "
+                f"{len(self.step_times)} шагов по {self.pages_per_step} стр., "
+                f"шаг ср. {self.mean_step() * 1000:.2f} мс, "
+                f"p95 {self.percentile_step(0.95) * 1000:.2f} мс, "
+                f"макс. {self.max_step() * 1000:.2f} мс, "
+                f"всего {self.elapsed:.2f} с")
+
+
+class BackupManager:
+    def __init__(self, db_file=DB_FILE, backup_dir=BACKUP_DIR,
+                 pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE,
+                 keep=BACKUP_KEEP):
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.pages = pages
+        self.pause = pause
+        self.keep = keep
+        self.thread = None
+        self.last_report = None
+        self.lock = threading.Lock()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def snapshot_path(self, prefix=SNAPSHOT_PREFIX):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.backup_dir,
+                            f"{prefix}{stamp}{SNAPSHOT_SUFFIX}")
+
+    def list_snapshots(self):
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = sorted(name for name in os.listdir(self.backup_dir)
+                       if name.startswith(SNAPSHOT_PREFIX)
+                       and name.endswith(SNAPSHOT_SUFFIX))
+        return [os.path.join(self.backup_dir, name) for name in names]
+
+    def rotate(self):
+        snapshots = self.list_snapshots()
+        for path in snapshots[:max(0, len(snapshots) - self.keep)]:
+            os.remove(path)
+
+    def copy(self, source, target, report):
+        last = time.perf_counter()
+
+        def progress(status, remaining, total):
+            nonlocal last
+            now = time.perf_counter()
+            report.step_times.append(now - last)
+            report.total_pages = total
+            if remaining and self.pause:
+                time.sleep(self.pause)
+            last = time.perf_counter()
+
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        try:
+            source.backup(target, pages=self.pages, progress=progress)
+        finally:
+            source.rollback()
+
+    def run_backup(self, path=None):
+        with self.lock:
+            path = path or self.snapshot_path()
+            report = BackupReport(path, self.pages)
+            part_path = path + ".part"
+            started = time.perf_counter()
+            source = target = None
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                source = sqlite3.connect(self.db_file)
+                target = sqlite3.connect(part_path)
+                self.copy(source, target, report)
+                target.close()
+                os.replace(part_path, path)
+                self.rotate()
+            except Exception as e:
+                report.error = e
+                if target is not None:
+                    target.close()
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            finally:
+                if source is not None:
+                    source.close()
+                report.elapsed = time.perf_counter() - started
+                self.last_report = report
+            return report
+
+    def start_backup(self):
+        if self.is_running():
+            return False
+        self.thread = threading.Thread(target=self.run_backup,
+                                       name="backup", daemon=True)
+        self.thread.start()
+        return True
+
+    def restore(self, snapshot, db):
+        with self.lock:
+            last_change_id = max(db.get_change_sequence(),
+                                 db.get_last_change_id())
+            source = sqlite3.connect(snapshot)
+            try:
+                db.conn.commit()
+                source.backup(db.conn)
+            finally:
+                source.close()
+            db.reopen()
+            db.mark_restored(last_change_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Резервная копия базы ежедневника")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--dir", default=BACKUP_DIR)
+    parser.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP)
+    parser.add_argument("--pause", type=float, default=BACKUP_STEP_PAUSE)
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    args = parser.parse_args()
+    manager = BackupManager(args.db, args.dir, args.pages, args.pause,
+                            args.keep)
+    print(manager.run_backup().summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from task_store import TaskStore
+
+CATEGORIES = ["Все категории", "Работа", "Дом", "Личное", "Образование",
+              "Социальное"]
+PRIORITIES = ["Низкий", "Средний", "Высокий"]
+
+
+def generate_rows(count, seed=0):
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield ("2024-%02d-%02d" % (rnd.randint(1, 12), rnd.randint(1, 28)),
+               "Задача номер %d" % i,
+               rnd.randint(0, 1),
+               # "".join создаёт новую строку на каждую запись, как sqlite3
+               # при выборке, чтобы кортежи не делили общие объекты str.
+               "".join(rnd.choice(CATEGORIES)),
+               "".join(rnd.choice(PRIORITIES)))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def filter_tuples(rows, cat, prio, search):
+    return [row for row in rows
+            if row[3] == cat and row[4] == prio and search in row[1].lower()]
+
+
+def report(name, current, peak, elapsed):
+    print(f"{name:<28} {current / 2 ** 20:9.1f} МБ "
+          f"(пик {peak / 2 ** 20:9.1f} МБ) {elapsed:7.2f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Память и скорость фильтрации кэша задач")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows, current, peak, elapsed = measure(
+        lambda: list(generate_rows(args.count)))
+    report("Список кортежей", current, peak, elapsed)
+    filtered, current, peak, elapsed = measure(
+        lambda: filter_tuples(rows, "Работа", "Высокий", "1"))
+    report("  фильтр (копия)", current, peak, elapsed)
+    del rows, filtered
+
+    store, current, peak, elapsed = measure(
+        lambda: TaskStore.from_rows(generate_rows(args.count)))
+    report("TaskStore", current, peak, elapsed)
+    indices, current, peak, elapsed = measure(
+        lambda: store.select(category="Работа", priority="Высокий",
+                             search="1"))
+    report("  фильтр (индексы)", current, peak, elapsed)
+    print(f"Найдено задач: {len(indices)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import hashlib
+import os
+import sqlite3
+
+DB_FILE = "diary.db"
+
+
+def task_hash(username, date_str, text, category, priority):
+    key = "\x1f".join((username, date_str, text, category, priority))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class Database:
+    def __init__(self, db_file, check_same_thread=True):
+        self.db_file = db_file
+        self.check_same_thread = check_same_thread
+        self.connect()
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.db_file,
+                                    check_same_thread=self.check_same_thread)
+        self.conn.execute("PRAGMA foreign_keys = 1;")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.create_function("py_lower", 1,
+                                  lambda s: s.lower() if s else s,
+                                  deterministic=True)
+        self.create_tables()
+        self.migrate_categories_unique()
+        self.migration_snapshot = None
+        self.merged_duplicate_tasks = self.migrate_task_hashes()
+
+    def reopen(self):
+        self.conn.close()
+        self.connect()
+
+    def create_tables(self):
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL
+        )
+        """)
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS theme (
+            username TEXT PRIMARY KEY,
+            dark INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+        )
+        """)
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            category_name TEXT NOT NULL,
+            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+        )
+        """)
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            date TEXT NOT NULL,
+            text TEXT NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            category TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            content_hash BLOB,
+            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+        )
+        """)
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            date TEXT,
+            ts TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        self.create_change_triggers()
+        self.conn.execute(
+            "DELETE FROM changes WHERE ts < datetime('now', '-1 day')")
+        self.conn.commit()
+
+    def create_change_triggers(self):
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_insert_change AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO changes (username, kind, date)
+            VALUES (NEW.username, 'task', NEW.date);
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_update_change AFTER UPDATE ON tasks
+        BEGIN
+            INSERT INTO changes (username, kind, date)
+            VALUES (NEW.username, 'task', NEW.date);
+            INSERT INTO changes (username, kind, date)
+            SELECT OLD.username, 'task', OLD.date
+            WHERE OLD.date <> NEW.date OR OLD.username <> NEW.username;
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_delete_change AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO changes (username, kind, date)
+            VALUES (OLD.username, 'task', OLD.date);
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS categories_insert_change
+        AFTER INSERT ON categories
+        BEGIN
+            INSERT INTO changes (username, kind) VALUES (NEW.username, 'category');
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS categories_delete_change
+        AFTER DELETE ON categories
+        BEGIN
+            INSERT INTO changes (username, kind) VALUES (OLD.username, 'category');
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS theme_insert_change AFTER INSERT ON theme
+        BEGIN
+            INSERT INTO changes (username, kind) VALUES (NEW.username, 'theme');
+        END
+        """)
+        self.conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS theme_update_change AFTER UPDATE ON theme
+        BEGIN
+            INSERT INTO changes (username, kind) VALUES (NEW.username, 'theme');
+        END
+        """)
+
+    def migrate_categories_unique(self):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND tbl_name='categories' "
+            "AND name IN ('idx_categories_user_name', 'sqlite_autoindex_categories_1')")
+        if cur.fetchone() is not None:
+            return
+        with self.conn:
+            self.conn.execute("""
+            DELETE FROM categories WHERE id NOT IN (
+                SELECT MIN(id) FROM categories
+                GROUP BY username, category_name
+            )
+            """)
+            self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_user_name
+            ON categories (username, category_name)
+            """)
+
+    def migrate_task_hashes(self):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_tasks_content_hash'")
+        if cur.fetchone() is not None:
+            return 0
+        cur.execute(
+            "SELECT id, username, date, text, category, priority FROM tasks")
+        rows = [(task_hash(username, date_str, text, cat, prio), task_id)
+                for task_id, username, date_str, text, cat, prio
+                in cur.fetchall()]
+        if len({content_hash for content_hash, _ in rows}) < len(rows):
+            from backup import BackupManager, MIGRATION_SNAPSHOT_PREFIX
+            manager = BackupManager(self.db_file)
+            report = manager.run_backup(
+                manager.snapshot_path(MIGRATION_SNAPSHOT_PREFIX))
+            if report.error is not None:
+                raise report.error
+            self.migration_snapshot = report.path
+        cur.execute("PRAGMA table_info(tasks)")
+        columns = [row[1] for row in cur.fetchall()]
+        if "content_hash" not in columns:
+            self.conn.execute("ALTER TABLE tasks ADD COLUMN content_hash BLOB")
+        self.conn.execute("DROP TRIGGER IF EXISTS tasks_update_change")
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE tasks SET content_hash=? WHERE id=?", rows)
+            cur.execute("""
+            DELETE FROM tasks WHERE id NOT IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY content_hash ORDER BY done DESC, id
+                    ) AS rn
+                    FROM tasks
+                ) WHERE rn = 1
+            )
+            """)
+            merged = cur.rowcount
+            self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_content_hash
+            ON tasks (content_hash)
+            """)
+            self.create_change_triggers()
+        return merged
+
+    def add_user(self, username, password_hash):
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO users (username, password_hash) VALUES (?,?)",
+                    (username, password_hash))
+        self.conn.commit()
+
+    def get_user(self, username):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT username, password_hash FROM users WHERE username=?",
+            (username,))
+        return cur.fetchone()
+
+    def update_user_password(self, username, new_hash):
+        cur = self.conn.cursor()
+        cur.execute("UPDATE users SET password_hash=? WHERE username=?",
+                    (new_hash, username))
+        self.conn.commit()
+
+    def delete_user(self, username):
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM users WHERE username=?", (username,))
+        self.conn.commit()
+
+    def get_theme(self, username):
+        cur = self.conn.cursor()
+        cur.execute("SELECT dark FROM theme WHERE username=?", (username,))
+        row = cur.fetchone()
+        if row is None:
+            return False
+        return bool(row[0])
+
+    def set_theme(self, username, dark):
+        cur = self.conn.cursor()
+        cur.execute("""INSERT INTO theme (username, dark) VALUES (?,?)
+                       ON CONFLICT(username) DO UPDATE SET dark=excluded.dark""",
+                    (username, 1 if dark else 0))
+        self.conn.commit()
+
+    def get_categories(self, username):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT category_name FROM categories WHERE username=? ORDER BY category_name",
+            (username,))
+        cats = [row[0] for row in cur.fetchall()]
+        if "Все категории" not in cats:
+            cats.insert(0, "Все категории")
+        return cats
+
+    def add_category(self, username, category_name):
+        if category_name == "Все категории":
+            return
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT INTO categories (username, category_name) VALUES (?,?) "
+            "ON CONFLICT(username, category_name) DO NOTHING",
+            (username, category_name))
+        self.conn.commit()
+
+    def delete_category(self, username, category_name):
+        if category_name == "Все категории":
+            return
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM tasks WHERE username=? AND category=?",
+                    (username, category_name))
+        cur.execute(
+            "DELETE FROM categories WHERE username=? AND category_name=?",
+            (username, category_name))
+        self.conn.commit()
+
+    def add_task(self, username, date_str, text, category, priority):
+        if not category:
+            category = "Все категории"
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT OR IGNORE INTO tasks (username, date, text, done, category, priority, content_hash) VALUES (?,?,?,?,?,?,?)",
+            (username, date_str, text, 0, category, priority,
+             task_hash(username, date_str, text, category, priority))
+        )
+        self.conn.commit()
+        return cur.rowcount > 0
+
+    def add_tasks(self, batches):
+        cur = self.conn.cursor()
+        counts = []
+        try:
+            for rows in batches:
+                cur.executemany(
+                    "INSERT OR IGNORE INTO tasks (username, date, text, done, category, priority, content_hash) VALUES (?,?,?,?,?,?,?)",
+                    ((username, date_str, text, done, cat, prio,
+                      task_hash(username, date_str, text, cat, prio))
+                     for username, date_str, text, done, cat, prio in rows))
+                counts.append(cur.rowcount)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return counts
+
+    def update_tasks_done(self, batches):
+        cur = self.conn.cursor()
+        counts = []
+        try:
+            for rows in batches:
+                cur.executemany("""UPDATE tasks 
+                                   SET done=? 
+                                   WHERE username=? AND date=? AND text=? AND category=? AND priority=?""",
+                                rows)
+                counts.append(cur.rowcount)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return counts
+
+    def import_tasks(self, username, rows):
+        categories = {(username, cat) for _, _, _, cat, _ in rows
+                      if cat != "Все категории"}
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO categories (username, category_name) VALUES (?,?) "
+                "ON CONFLICT(username, category_name) DO NOTHING",
+                categories)
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (username, date, text, done, category, priority, content_hash) VALUES (?,?,?,?,?,?,?)",
+                ((username, date_str, text, 1 if done else 0, cat, prio,
+                  task_hash(username, date_str, text, cat, prio))
+                 for date_str, text, done, cat, prio in rows))
+        inserted = cur.rowcount
+        return inserted, len(rows) - inserted
+
+    def update_task_fields(self, username, date_str, text, done, category,
+                           priority, new_cat=None, new_prio=None):
+        if new_cat is None and new_prio is None:
+            return True
+        new_cat = category if new_cat is None else new_cat
+        new_prio = priority if new_prio is None else new_prio
+        if (new_cat, new_prio) == (category, priority):
+            return True
+        content_hash = task_hash(username, date_str, text, new_cat, new_prio)
+        cur = self.conn.cursor()
+        cur.execute("SELECT 1 FROM tasks WHERE content_hash=?",
+                    (content_hash,))
+        if cur.fetchone() is not None:
+            return False
+        cur.execute(
+            "UPDATE tasks SET category=?, priority=?, content_hash=? WHERE username=? AND date=? AND text=? AND done=? AND category=? AND priority=?",
+            (new_cat, new_prio, content_hash,
+             username, date_str, text, 1 if done else 0, category, priority))
+        self.conn.commit()
+        return True
+
+    def get_tasks_for_date(self, username, date_str):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT text, done, category, priority FROM tasks WHERE username=? AND date=?",
+            (username, date_str))
+        return cur.fetchall()
+
+    def get_tasks_for_range(self, username, start_date, end_date):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT date, text, done, category, priority FROM tasks WHERE username=? AND date BETWEEN ? AND ? ORDER BY date, id",
+            (username, start_date, end_date))
+        return cur.fetchall()
+
+    def delete_task(self, username, date_str, text, done, category, priority):
+        cur = self.conn.cursor()
+        d_val = 1 if done else 0
+        cur.execute(
+            "DELETE FROM tasks WHERE username=? AND date=? AND text=? AND done=? AND category=? AND priority=?",
+            (username, date_str, text, d_val, category, priority))
+        self.conn.commit()
+
+    def update_task_done(self, username, date_str, text, category, priority,
+                         done_state):
+        d_val = 1 if done_state else 0
+        cur = self.conn.cursor()
+        cur.execute("""UPDATE tasks 
+                       SET done=? 
+                       WHERE username=? AND date=? AND text=? AND category=? AND priority=?""",
+                    (d_val, username, date_str, text, category, priority))
+        self.conn.commit()
+
+    def delete_all_done_tasks(self, username, date_str):
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM tasks WHERE username=? AND date=? AND done=1",
+                    (username, date_str))
+        self.conn.commit()
+
+    def mark_all_tasks_done(self, username, date_str):
+        cur = self.conn.cursor()
+        cur.execute("UPDATE tasks SET done=1 WHERE username=? AND date=?",
+                    (username, date_str))
+        self.conn.commit()
+
+    def search_tasks(self, username, query, limit=500):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT date, text, done, category, priority FROM tasks WHERE username=? AND instr(py_lower(text), ?) > 0 ORDER BY date LIMIT ?",
+            (username, query.lower(), limit))
+        return cur.fetchall()
+
+    def iter_tasks(self, username):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT date, text, done, category, priority FROM tasks WHERE username=? ORDER BY date",
+            (username,))
+        return cur
+
+    def get_stats(self, username):
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*), SUM(done) FROM tasks WHERE username=?",
+                    (username,))
+        row = cur.fetchone()
+        total_tasks = row[0]
+        done_tasks = row[1] if row[1] is not None else 0
+        return total_tasks, done_tasks
+
+    def get_monthly_tasks(self, username, month):
+        month_str = f"{month:02d}"
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT date, text, done, category, priority FROM tasks WHERE username=? AND strftime('%m', date)=?",
+            (username, month_str))
+        return cur.fetchall()
+
+    def get_data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get_last_change_id(self):
+        row = self.conn.execute("SELECT MAX(id) FROM changes").fetchone()
+        return row[0] if row[0] is not None else 0
+
+    def get_change_sequence(self):
+        row = self.conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name='changes'").fetchone()
+        return row[0] if row is not None else 0
+
+    def mark_restored(self, min_change_id):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name='changes'",
+                (min_change_id,))
+            self.conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT 'changes', ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name='changes')",
+                (min_change_id,))
+            self.conn.execute(
+                "INSERT INTO changes (username, kind) VALUES ('*', 'restore')")
+
+    def get_changes_between(self, username, after_id, upto_id):
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT DISTINCT kind, date FROM changes WHERE id>? AND id<=? AND username IN (?, '*')",
+            (after_id, upto_id, username))
+        return cur.fetchall()
+
+    def export_categories(self, username, filename):
+        cats = self.get_categories(username)
+        with open(filename, "w", encoding="utf-8") as f:
+            for c in cats:
+                if c != "Все категории":
+                    f.write(c + "\n")
+
+    def import_categories(self, username, filename):
+        if not os.path.exists(filename):
+            return
+        with open(filename, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        rows = []
+        for c in lines:
+            cat = c.strip()
+            if cat and cat != "Все категории":
+                rows.append((username, cat))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO categories (username, category_name) VALUES (?,?) "
+                "ON CONFLICT(username, category_name) DO NOTHING",
+                rows)
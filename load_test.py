@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlencode
+
+from api_server import ApiServer, DEFAULT_HOST, DEFAULT_PORT
+from database import Database
+
+
+async def request(reader, writer, method, path, params=None, payload=None):
+    if params:
+        path += "?" + urlencode(params)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\n"
+                  f"Host: localhost\r\n"
+                  f"Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1")
+                 + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        data = b""
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            data += chunk[:-2]
+    else:
+        data = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, data
+
+
+async def client(host, port, user, requests_count, write_ratio, latencies,
+                 errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(requests_count):
+            day = f"2024-01-{random.randint(1, 28):02d}"
+            roll = random.random()
+            started = time.perf_counter()
+            if roll < write_ratio:
+                status, _ = await request(reader, writer, "POST", "/tasks",
+                                          payload={"user": user, "tasks": [
+                                              {"date": day,
+                                               "text": f"Задача {i}",
+                                               "category": "Работа",
+                                               "priority": "Средний"}]})
+            elif roll < write_ratio + 0.1:
+                status, _ = await request(reader, writer, "GET", "/search",
+                                          {"user": user, "q": "задача 1"})
+            elif roll < write_ratio + 0.15:
+                status, _ = await request(reader, writer, "GET", "/stats",
+                                          {"user": user})
+            else:
+                status, _ = await request(reader, writer, "GET", "/tasks",
+                                          {"user": user, "date": day})
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def run(args):
+    server = None
+    if args.start_server:
+        server = ApiServer(args.db, args.host, args.port, args.readers)
+        await server.start()
+    try:
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client(args.host, args.port, args.user, args.requests,
+                   args.write_ratio, latencies, errors)
+            for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        export_started = time.perf_counter()
+        _, data = await request(reader, writer, "GET", "/export",
+                                {"user": args.user})
+        export_elapsed = time.perf_counter() - export_started
+        writer.close()
+    finally:
+        if server is not None:
+            await server.close()
+
+    total = len(latencies)
+    print(f"Запросов: {total}, ошибок: {len(errors)}, "
+          f"время: {elapsed:.2f} с, {total / elapsed:.0f} запр/с")
+    print(f"Задержка, мс: среднее {statistics.mean(latencies) * 1000:.2f}, "
+          f"p50 {percentile(latencies, 0.50) * 1000:.2f}, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f}, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f}")
+    exported = data.count(b"\n")
+    print(f"Экспорт: {exported} задач за {export_elapsed:.2f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест локального JSON API")
+    parser.add_argument("--db", default="loadtest.db")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--user", default="loadtest")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--start-server", action="store_true",
+                        help="запустить сервер в этом же процессе")
+    args = parser.parse_args()
+    if args.start_server:
+        db = Database(args.db)
+        if db.get_user(args.user) is None:
+            db.add_user(args.user, "")
+        db.conn.close()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
 import sys
 import os
-import hashlib
-import sqlite3
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QMessageBox, QDialog, QVBoxLayout, QLabel,
@@ -9,214 +7,71 @@ from PyQt6.QtWidgets import (
     QHBoxLayout, QFileDialog, QInputDialog, QComboBox
 )
 from PyQt6 import uic
-from PyQt6.QtCore import QDate
+from PyQt6.QtCore import QDate, QTimer, QThread, pyqtSignal
 from openpyxl import Workbook, load_workbook
+from database import Database, DB_FILE
+from task_store import TaskStore
+from backup import BackupManager
+import passwords
+from profiler import ActionProfiler, ProfiledDatabase, profiled
+
+CHANGE_POLL_INTERVAL_MS = 1000
+BACKUP_INTERVAL_MS = 6 * 60 * 60 * 1000
+BACKUP_POLL_INTERVAL_MS = 250
+
+
+class RefreshScheduler:
+    def __init__(self, parent=None, profiler=None):
+        self.profiler = profiler or ActionProfiler()
+        self.handlers = {}
+        self.dirty = set()
+        self.rebuild_counts = {}
+        self.pending_action = None
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+
+    def register(self, name, handler):
+        self.handlers[name] = handler
+        self.rebuild_counts[name] = 0
+
+    def mark_dirty(self, *names):
+        self.dirty.update(names)
+        if self.pending_action is None:
+            self.pending_action = self.profiler.current
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        record, self.pending_action = self.pending_action, None
+        with self.profiler.detached(), self.profiler.resume(record):
+            self.timer.stop()
+            for name, handler in self.handlers.items():
+                if name in self.dirty:
+                    self.dirty.discard(name)
+                    self.rebuild_counts[name] += 1
+                    handler()
+            if self.dirty:
+                self.timer.start()
+
+
+class PasswordWorker(QThread):
+    result_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, func, *args, parent=None):
+        super().__init__(parent)
+        self.func = func
+        self.args = args
 
-DB_FILE = "diary.db"
-
-
-class Database:
-    def __init__(self, db_file):
-        self.conn = sqlite3.connect(db_file)
-        self.conn.execute("PRAGMA foreign_keys = 1;")
-        self.create_tables()
-
-    def create_tables(self):
-        self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL
-        )
-        """)
-
-        self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS theme (
-            username TEXT PRIMARY KEY,
-            dark INTEGER NOT NULL DEFAULT 0,
-            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-        )
-        """)
-
-        self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            category_name TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-        )
-        """)
-
-        self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            date TEXT NOT NULL,
-            text TEXT NOT NULL,
-            done INTEGER NOT NULL DEFAULT 0,
-            category TEXT NOT NULL,
-            priority TEXT NOT NULL,
-            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-        )
-        """)
-        self.conn.commit()
-
-    def add_user(self, username, password_hash):
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO users (username, password_hash) VALUES (?,?)",
-                    (username, password_hash))
-        self.conn.commit()
-
-    def get_user(self, username):
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT username, password_hash FROM users WHERE username=?",
-            (username,))
-        return cur.fetchone()
-
-    def update_user_password(self, username, new_hash):
-        cur = self.conn.cursor()
-        cur.execute("UPDATE users SET password_hash=? WHERE username=?",
-                    (new_hash, username))
-        self.conn.commit()
-
-    def delete_user(self, username):
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM users WHERE username=?", (username,))
-        self.conn.commit()
-
-    def get_theme(self, username):
-        cur = self.conn.cursor()
-        cur.execute("SELECT dark FROM theme WHERE username=?", (username,))
-        row = cur.fetchone()
-        if row is None:
-            return False
-        return bool(row[0])
-
-    def set_theme(self, username, dark):
-        cur = self.conn.cursor()
-        cur.execute("SELECT username FROM theme WHERE username=?", (username,))
-        if cur.fetchone() is None:
-            cur.execute("INSERT INTO theme (username, dark) VALUES (?,?)",
-                        (username, 1 if dark else 0))
-        else:
-            cur.execute("UPDATE theme SET dark=? WHERE username=?",
-                        (1 if dark else 0, username))
-        self.conn.commit()
-
-    def get_categories(self, username):
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT category_name FROM categories WHERE username=? ORDER BY category_name",
-            (username,))
-        cats = [row[0] for row in cur.fetchall()]
-        if "Все категории" not in cats:
-            cats.insert(0, "Все категории")
-        return cats
-
-    def add_category(self, username, category_name):
-        if category_name == "Все категории":
-            return
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT category_name FROM categories WHERE username=? AND category_name=?",
-            (username, category_name))
-        if cur.fetchone() is None:
-            cur.execute(
-                "INSERT INTO categories (username, category_name) VALUES (?,?)",
-                (username, category_name))
-            self.conn.commit()
-
-    def delete_category(self, username, category_name):
-        if category_name == "Все категории":
-            return
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM tasks WHERE username=? AND category=?",
-                    (username, category_name))
-        cur.execute(
-            "DELETE FROM categories WHERE username=? AND category_name=?",
-            (username, category_name))
-        self.conn.commit()
-
-    def add_task(self, username, date_str, text, category, priority):
-        if not category:
-            category = "Все категории"
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO tasks (username, date, text, done, category, priority) VALUES (?,?,?,?,?,?)",
-            (username, date_str, text, 0, category, priority)
-        )
-        self.conn.commit()
-
-    def get_tasks_for_date(self, username, date_str):
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT text, done, category, priority FROM tasks WHERE username=? AND date=?",
-            (username, date_str))
-        return cur.fetchall()
-
-    def delete_task(self, username, date_str, text, done, category, priority):
-        cur = self.conn.cursor()
-        d_val = 1 if done else 0
-        cur.execute(
-            "DELETE FROM tasks WHERE username=? AND date=? AND text=? AND done=? AND category=? AND priority=?",
-            (username, date_str, text, d_val, category, priority))
-        self.conn.commit()
-
-    def update_task_done(self, username, date_str, text, category, priority,
-                         done_state):
-        d_val = 1 if done_state else 0
-        cur = self.conn.cursor()
-        cur.execute("""UPDATE tasks 
-                       SET done=? 
-                       WHERE username=? AND date=? AND text=? AND category=? AND priority=?""",
-                    (d_val, username, date_str, text, category, priority))
-        self.conn.commit()
-
-    def delete_all_done_tasks(self, username, date_str):
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM tasks WHERE username=? AND date=? AND done=1",
-                    (username, date_str))
-        self.conn.commit()
-
-    def mark_all_tasks_done(self, username, date_str):
-        cur = self.conn.cursor()
-        cur.execute("UPDATE tasks SET done=1 WHERE username=? AND date=?",
-                    (username, date_str))
-        self.conn.commit()
-
-    def get_stats(self, username):
-        cur = self.conn.cursor()
-        cur.execute("SELECT COUNT(*), SUM(done) FROM tasks WHERE username=?",
-                    (username,))
-        row = cur.fetchone()
-        total_tasks = row[0]
-        done_tasks = row[1] if row[1] is not None else 0
-        return total_tasks, done_tasks
-
-    def get_monthly_tasks(self, username, month):
-        month_str = f"{month:02d}"
-        cur = self.conn.cursor()
-        cur.execute(
-            "SELECT date, text, done, category, priority FROM tasks WHERE username=? AND strftime('%m', date)=?",
-            (username, month_str))
-        return cur.fetchall()
-
-    def export_categories(self, username, filename):
-        cats = self.get_categories(username)
-        with open(filename, "w", encoding="utf-8") as f:
-            for c in cats:
-                if c != "Все категории":
-                    f.write(c + "\n")
-
-    def import_categories(self, username, filename):
-        if not os.path.exists(filename):
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.failed.emit(str(e))
             return
-        with open(filename, "r", encoding="utf-8") as f:
-            lines = f.read().splitlines()
-        for c in lines:
-            cat = c.strip()
-            if cat:
-                self.add_category(username, cat)
+        self.result_ready.emit(result)
 
 
 class LoginDialog(QDialog):
@@ -246,6 +101,35 @@ class LoginDialog(QDialog):
         self.register_button.clicked.connect(self.attempt_register)
         self.cancel_button.clicked.connect(self.reject)
         self.logged_in_username = None
+        self.pending_username = None
+        self.worker = None
+
+    def is_busy(self):
+        return self.worker is not None and self.worker.isRunning()
+
+    def set_busy(self, busy):
+        if not busy and self.worker is not None:
+            self.worker.wait()
+        self.login_button.setEnabled(not busy)
+        self.register_button.setEnabled(not busy)
+        self.cancel_button.setEnabled(not busy)
+
+    def reject(self):
+        if self.is_busy():
+            return
+        super().reject()
+
+    def run_worker(self, callback, func, *args):
+        self.set_busy(True)
+        self.worker = PasswordWorker(func, *args, parent=self)
+        self.worker.result_ready.connect(callback)
+        self.worker.failed.connect(self.worker_failed)
+        self.worker.start()
+
+    def worker_failed(self, message):
+        self.set_busy(False)
+        QMessageBox.warning(self, "Ошибка",
+                            f"Не удалось проверить пароль: {message}")
 
     def attempt_login(self):
         username = self.username_edit.text().strip()
@@ -257,13 +141,20 @@ class LoginDialog(QDialog):
         if user is None:
             QMessageBox.warning(self, "Ошибка", "Пользователь не найден!")
             return
-        stored_hash = user[1]
-        hashed = hashlib.sha256(password.encode('utf-8')).hexdigest()
-        if stored_hash == hashed:
-            self.logged_in_username = username
-            self.accept()
-        else:
+        self.pending_username = username
+        self.run_worker(self.login_checked, passwords.check_login, password,
+                        user[1])
+
+    def login_checked(self, result):
+        self.set_busy(False)
+        ok, new_hash = result
+        if not ok:
             QMessageBox.warning(self, "Ошибка", "Неверный пароль!")
+            return
+        if new_hash is not None:
+            self.db.update_user_password(self.pending_username, new_hash)
+        self.logged_in_username = self.pending_username
+        self.accept()
 
     def attempt_register(self):
         username = self.username_edit.text().strip()
@@ -275,7 +166,16 @@ class LoginDialog(QDialog):
         if user is not None:
             QMessageBox.warning(self, "Ошибка", "Пользователь уже существует!")
             return
-        hashed = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        self.pending_username = username
+        self.run_worker(self.register_hashed, passwords.hash_password,
+                        password)
+
+    def register_hashed(self, hashed):
+        self.set_busy(False)
+        username = self.pending_username
+        if self.db.get_user(username) is not None:
+            QMessageBox.warning(self, "Ошибка", "Пользователь уже существует!")
+            return
         self.db.add_user(username, hashed)
         QMessageBox.information(self, "Успех",
                                 "Пользователь успешно зарегистрирован!")
@@ -317,6 +217,21 @@ class ChangePasswordDialog(QDialog):
         self.setLayout(layout)
         self.ok_button.clicked.connect(self.change_password)
         self.cancel_button.clicked.connect(self.reject)
+        self.worker = None
+
+    def is_busy(self):
+        return self.worker is not None and self.worker.isRunning()
+
+    def set_busy(self, busy):
+        if not busy and self.worker is not None:
+            self.worker.wait()
+        self.ok_button.setEnabled(not busy)
+        self.cancel_button.setEnabled(not busy)
+
+    def reject(self):
+        if self.is_busy():
+            return
+        super().reject()
 
     def change_password(self):
         old_p = self.old_password_edit.text().strip()
@@ -330,25 +245,92 @@ class ChangePasswordDialog(QDialog):
         if user is None:
             QMessageBox.warning(self, "Ошибка", "Пользователь не найден!")
             return
-        old_hash = hashlib.sha256(old_p.encode('utf-8')).hexdigest()
-        if user[1] != old_hash:
-            QMessageBox.warning(self, "Ошибка", "Старый пароль неверен!")
-            return
         if new_p != conf_p:
             QMessageBox.warning(self, "Ошибка", "Пароли не совпадают!")
             return
-        new_hash = hashlib.sha256(new_p.encode('utf-8')).hexdigest()
+        self.set_busy(True)
+        self.worker = PasswordWorker(passwords.check_password_change, old_p,
+                                     new_p, user[1], parent=self)
+        self.worker.result_ready.connect(self.password_checked)
+        self.worker.failed.connect(self.worker_failed)
+        self.worker.start()
+
+    def worker_failed(self, message):
+        self.set_busy(False)
+        QMessageBox.warning(self, "Ошибка",
+                            f"Не удалось изменить пароль: {message}")
+
+    def password_checked(self, result):
+        self.set_busy(False)
+        ok, new_hash = result
+        if not ok:
+            QMessageBox.warning(self, "Ошибка", "Старый пароль неверен!")
+            return
         self.db.update_user_password(self.username, new_hash)
         QMessageBox.information(self, "Успех", "Пароль успешно изменен!")
         self.accept()
 
 
+class ChangeWatcher:
+    def __init__(self, db, username, callback, parent=None,
+                 interval=CHANGE_POLL_INTERVAL_MS, profiler=None):
+        self.profiler = profiler or ActionProfiler()
+        self.db = db
+        self.username = username
+        self.callback = callback
+        self.data_version = db.get_data_version()
+        self.last_change_id = db.get_last_change_id()
+        self.timer = QTimer(parent)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def reset(self):
+        self.data_version = self.db.get_data_version()
+        self.last_change_id = self.db.get_last_change_id()
+
+    def poll(self):
+        with self.profiler.detached():
+            version = self.db.get_data_version()
+            if version == self.data_version:
+                return
+            self.data_version = version
+            last_id = self.db.get_last_change_id()
+            if last_id < self.last_change_id:
+                self.last_change_id = last_id
+                self.callback({"restore"}, set())
+                return
+            if last_id == self.last_change_id:
+                return
+            rows = self.db.get_changes_between(
+                self.username, self.last_change_id, last_id)
+            self.last_change_id = last_id
+            if not rows:
+                return
+            dates = set()
+            kinds = set()
+            for kind, date_str in rows:
+                kinds.add(kind)
+                if kind == "task":
+                    dates.add(date_str)
+            self.callback(kinds, dates)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self, db, username):
+    def __init__(self, db, username, profiler=None):
         super().__init__()
         uic.loadUi("mainwindow.ui", self)
-        self.db = db
+        self.profiler = profiler or ActionProfiler()
+        self.db = ProfiledDatabase(db, self.profiler)
         self.current_user = username
+        self.refresh_scheduler = RefreshScheduler(self, self.profiler)
+        self.task_cache = None
+        self.task_cache_month = None
 
         self.priorityFilterComboBox = QComboBox()
         self.priorityFilterComboBox.addItem("Все приоритеты")
@@ -357,7 +339,7 @@ class MainWindow(QMainWindow):
         self.priorityFilterComboBox.addItem("Высокий")
         self.gridLayout.addWidget(self.priorityFilterComboBox, 0, 5)
         self.priorityFilterComboBox.currentIndexChanged.connect(
-            self.update_task_list)
+            self.on_filter_changed)
 
         self.changePriorityButton = QPushButton("Изменить приоритет")
         self.gridLayout.addWidget(self.changePriorityButton, 8, 1)
@@ -382,8 +364,8 @@ class MainWindow(QMainWindow):
         self.markDoneButton.clicked.connect(self.mark_task_done)
         self.unmarkButton.clicked.connect(self.unmark_task)
         self.statsButton.clicked.connect(self.show_stats)
-        self.calendarWidget.selectionChanged.connect(self.update_task_list)
-        self.searchLineEdit.textChanged.connect(self.update_task_list)
+        self.calendarWidget.selectionChanged.connect(self.on_filter_changed)
+        self.searchLineEdit.textChanged.connect(self.on_filter_changed)
         self.deleteAllDoneButton.clicked.connect(self.delete_all_done_tasks)
         self.markAllDoneButton.clicked.connect(self.mark_all_tasks_done)
         self.actionSave_to_Excel.triggered.connect(self.save_to_excel)
@@ -415,14 +397,106 @@ class MainWindow(QMainWindow):
         self.actionImportCategories.triggered.connect(self.import_categories)
         self.actionToggleTheme = self.menuFile.addAction("Переключить тему")
         self.actionToggleTheme.triggered.connect(self.toggle_theme)
+        self.actionBackup = self.menuFile.addAction(
+            "Создать резервную копию")
+        self.actionBackup.triggered.connect(self.create_backup)
+        self.actionRestore = self.menuFile.addAction(
+            "Восстановить из резервной копии")
+        self.actionRestore.triggered.connect(self.restore_backup)
+        self.menuProfile = self.menuFile.addMenu("Профилирование")
+        self.actionProfile = self.menuProfile.addAction(
+            "Включить профилирование")
+        self.actionProfile.setCheckable(True)
+        self.actionProfile.setChecked(self.profiler.enabled)
+        self.actionProfile.toggled.connect(self.toggle_profiling)
+        self.actionProfileCProfile = self.menuProfile.addAction(
+            "Снимки cProfile")
+        self.actionProfileCProfile.setCheckable(True)
+        self.actionProfileCProfile.setChecked(self.profiler.capture_cprofile)
+        self.actionProfileCProfile.toggled.connect(
+            self.toggle_profile_cprofile)
+        self.actionProfileMemory = self.menuProfile.addAction(
+            "Снимки памяти (tracemalloc)")
+        self.actionProfileMemory.setCheckable(True)
+        self.actionProfileMemory.setChecked(self.profiler.capture_memory)
+        self.actionProfileMemory.toggled.connect(self.toggle_profile_memory)
+        self.actionProfileDump = self.menuProfile.addAction(
+            "Сохранить отчёт профилирования")
+        self.actionProfileDump.triggered.connect(self.dump_profile_report)
         self.setWindowTitle(f"Ежедневник - Пользователь: {self.current_user}")
-        self.update_category_list()
+        self.refresh_scheduler.register("categories",
+                                        self.update_category_list)
+        self.refresh_scheduler.register("tasks", self.update_task_list)
         self.load_theme()
-        self.update_task_list()
+        self.request_refresh("categories", "tasks")
+        self.refresh_scheduler.flush()
+
+        self.change_watcher = ChangeWatcher(self.db, self.current_user,
+                                            self.apply_external_changes, self,
+                                            profiler=self.profiler)
+        self.change_watcher.start()
+
+        self.backup_manager = BackupManager(self.db.db_file)
+        self.backup_timer = QTimer(self)
+        self.backup_timer.setInterval(BACKUP_INTERVAL_MS)
+        self.backup_timer.timeout.connect(self.start_scheduled_backup)
+        self.backup_timer.start()
+        self.backup_poll_timer = QTimer(self)
+        self.backup_poll_timer.setInterval(BACKUP_POLL_INTERVAL_MS)
+        self.backup_poll_timer.timeout.connect(self.check_backup_finished)
+
+    @profiled
+    def apply_external_changes(self, kinds, dates):
+        if "restore" in kinds:
+            self.invalidate_task_cache()
+            self.load_theme()
+            self.request_refresh("categories", "tasks")
+            return
+        if "theme" in kinds:
+            self.load_theme()
+        date_str = self.get_selected_date().toString("yyyy-MM-dd")
+        month = self.task_cache_month
+        if month and any(d and d.startswith(month) for d in dates):
+            self.invalidate_task_cache()
+        if "category" in kinds:
+            self.request_refresh("categories", "tasks")
+        elif date_str in dates:
+            self.request_refresh("tasks")
+
+    def toggle_profiling(self, checked):
+        self.profiler.enabled = checked
+        if not checked and self.profiler.records:
+            self.dump_profile_report()
+
+    def toggle_profile_cprofile(self, checked):
+        self.profiler.capture_cprofile = checked
+
+    def toggle_profile_memory(self, checked):
+        self.profiler.capture_memory = checked
+
+    def dump_profile_report(self):
+        if not self.profiler.records:
+            QMessageBox.information(self, "Профилирование",
+                                    "Нет записанных действий.")
+            return
+        path = self.profiler.dump()
+        QMessageBox.information(self, "Профилирование",
+                                f"Отчёт сохранён в {path}")
+
+    def request_refresh(self, *views):
+        self.refresh_scheduler.mark_dirty(*views)
+
+    def invalidate_task_cache(self):
+        self.task_cache = None
+        self.task_cache_month = None
 
+    def on_filter_changed(self, *args):
+        self.request_refresh("tasks")
+
+    @profiled
     def toggle_sort_by_date(self):
         self.sort_by_date = not self.sort_by_date
-        self.update_task_list()
+        self.request_refresh("tasks")
 
     def load_theme(self):
         dark = self.db.get_theme(self.current_user)
@@ -438,6 +512,7 @@ class MainWindow(QMainWindow):
     def set_light_theme(self):
         self.setStyleSheet("")
 
+    @profiled
     def toggle_theme(self):
         current = self.db.get_theme(self.current_user)
         new_val = not current
@@ -450,31 +525,41 @@ class MainWindow(QMainWindow):
     def add_category_combobox(self):
         self.categoryComboBox = QComboBox()
         self.categoryComboBox.currentIndexChanged.connect(
-            self.update_task_list)
+            self.on_filter_changed)
         self.gridLayout.addWidget(self.categoryComboBox, 0, 4)
 
     def add_category(self):
         category, ok = QInputDialog.getText(self, "Добавить категорию",
                                             "Название категории:")
         if ok and category.strip():
-            self.db.add_category(self.current_user, category.strip())
-            self.update_category_list()
+            with self.profiler.action("add_category"):
+                self.db.add_category(self.current_user, category.strip())
+                self.request_refresh("categories")
 
     def delete_category(self):
         if self.categoryComboBox.currentText() == "Все категории":
             QMessageBox.warning(self, "Ошибка",
                                 "Эту категорию нельзя удалить.")
             return
-        cat = self.categoryComboBox.currentText()
-        self.db.delete_category(self.current_user, cat)
-        self.update_category_list()
-        self.update_task_list()
+        with self.profiler.action("delete_category"):
+            cat = self.categoryComboBox.currentText()
+            self.db.delete_category(self.current_user, cat)
+            self.invalidate_task_cache()
+            self.request_refresh("categories", "tasks")
 
+    @profiled
     def update_category_list(self):
-        self.categoryComboBox.clear()
+        current = self.categoryComboBox.currentText()
         categories = self.db.get_categories(self.current_user)
-        for c in categories:
-            self.categoryComboBox.addItem(c)
+        with self.profiler.phase("widgets"):
+            self.categoryComboBox.blockSignals(True)
+            self.categoryComboBox.clear()
+            self.categoryComboBox.addItems(categories)
+            if current in categories:
+                self.categoryComboBox.setCurrentText(current)
+            self.categoryComboBox.blockSignals(False)
+        if self.categoryComboBox.currentText() != current:
+            self.request_refresh("tasks")
 
     def get_selected_date(self):
         return self.calendarWidget.selectedDate()
@@ -484,13 +569,19 @@ class MainWindow(QMainWindow):
         if not task_text:
             QMessageBox.warning(self, "Ошибка", "Введите текст задачи!")
             return
-        date = self.get_selected_date()
-        cat = self.categoryComboBox.currentText()
-        priority = self.priorityComboBox.currentText()
-        date_str = date.toString("yyyy-MM-dd")
-        self.db.add_task(self.current_user, date_str, task_text, cat, priority)
-        self.taskLineEdit.clear()
-        self.update_task_list()
+        with self.profiler.action("add_task"):
+            date = self.get_selected_date()
+            cat = self.categoryComboBox.currentText()
+            priority = self.priorityComboBox.currentText()
+            date_str = date.toString("yyyy-MM-dd")
+            added = self.db.add_task(self.current_user, date_str, task_text,
+                                     cat, priority)
+            if added:
+                self.taskLineEdit.clear()
+                self.invalidate_task_cache()
+                self.request_refresh("tasks")
+        if not added:
+            QMessageBox.warning(self, "Ошибка", "Такая задача уже существует!")
 
     def delete_task(self):
         selected_items = self.tasksListWidget.selectedItems()
@@ -513,16 +604,19 @@ class MainWindow(QMainWindow):
         cat = display_str[cat_start + 1:cat_end]
         prio = display_str[priority_start + 1:priority_end]
 
-        self.db.delete_task(self.current_user, date_str, text, done, cat, prio)
-        self.update_task_list()
+        with self.profiler.action("delete_task"):
+            self.db.delete_task(self.current_user, date_str, text, done, cat,
+                                prio)
+            self.invalidate_task_cache()
+            self.request_refresh("tasks")
 
     def mark_task_done(self):
-        self._set_task_done_state(True)
+        self._set_task_done_state(True, "mark_task_done")
 
     def unmark_task(self):
-        self._set_task_done_state(False)
+        self._set_task_done_state(False, "unmark_task")
 
-    def _set_task_done_state(self, done_state: bool):
+    def _set_task_done_state(self, done_state: bool, action_name: str):
         selected_items = self.tasksListWidget.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "Ошибка", "Выберите задачу!")
@@ -542,45 +636,56 @@ class MainWindow(QMainWindow):
         cat = display_str[cat_start + 1:cat_end]
         prio = display_str[priority_start + 1:priority_end]
 
-        self.db.update_task_done(self.current_user, date_str, text, cat, prio,
-                                 done_state)
-        self.update_task_list()
+        with self.profiler.action(action_name):
+            self.db.update_task_done(self.current_user, date_str, text, cat,
+                                     prio, done_state)
+            self.invalidate_task_cache()
+            self.request_refresh("tasks")
 
-    def filter_tasks(self, tasks_list):
+    def filter_tasks(self, store, date_str):
         search_query = self.searchLineEdit.text().strip().lower()
         selected_cat = self.categoryComboBox.currentText()
         selected_prio = self.priorityFilterComboBox.currentText()
-
-        filtered = []
-        for (text, done, cat, prio) in tasks_list:
-            if selected_cat != "Все категории" and cat != selected_cat:
-                continue
-            if selected_prio != "Все приоритеты" and prio != selected_prio:
-                continue
-            if search_query and search_query not in text.lower():
-                continue
-            filtered.append((text, done, cat, prio))
-        return filtered
-
+        return store.select(
+            date_str=date_str,
+            category=None if selected_cat == "Все категории" else selected_cat,
+            priority=(None if selected_prio == "Все приоритеты"
+                      else selected_prio),
+            search=search_query or None)
+
+    def get_task_cache(self, date):
+        month = date.toString("yyyy-MM")
+        if self.task_cache is None or self.task_cache_month != month:
+            rows = self.db.get_tasks_for_range(
+                self.current_user, f"{month}-01", f"{month}-31")
+            self.task_cache = TaskStore.from_rows(rows)
+            self.task_cache_month = month
+        return self.task_cache
+
+    @profiled
     def update_task_list(self):
-        self.tasksListWidget.clear()
         date = self.get_selected_date()
         date_str = date.toString("yyyy-MM-dd")
-        tasks_list = self.db.get_tasks_for_date(self.current_user, date_str)
-        filtered = self.filter_tasks(tasks_list)
-        for text, done, cat, prio in filtered:
-            display_text = (
-                               "[✓] " if done else "") + text + f" ({cat}) [{prio}]"
-            self.tasksListWidget.addItem(display_text)
+        store = self.get_task_cache(date)
+        with self.profiler.phase("filter"):
+            items = []
+            for i in self.filter_tasks(store, date_str):
+                prefix = "[✓] " if store.done[i] else ""
+                items.append(prefix + store.texts[i] +
+                             f" ({store.category(i)}) [{store.priority(i)}]")
+        with self.profiler.phase("widgets"):
+            self.tasksListWidget.clear()
+            self.tasksListWidget.addItems(items)
 
     def show_stats(self):
-        total_tasks, done_tasks = self.db.get_stats(self.current_user)
-        stats_dialog = QDialog(self)
-        stats_dialog.setWindowTitle("Статистика")
-        layout = QVBoxLayout()
-        layout.addWidget(QLabel(f"Всего задач: {total_tasks}"))
-        layout.addWidget(QLabel(f"Выполнено задач: {done_tasks}"))
-        stats_dialog.setLayout(layout)
+        with self.profiler.action("show_stats"):
+            total_tasks, done_tasks = self.db.get_stats(self.current_user)
+            stats_dialog = QDialog(self)
+            stats_dialog.setWindowTitle("Статистика")
+            layout = QVBoxLayout()
+            layout.addWidget(QLabel(f"Всего задач: {total_tasks}"))
+            layout.addWidget(QLabel(f"Выполнено задач: {done_tasks}"))
+            stats_dialog.setLayout(layout)
         stats_dialog.exec()
 
     def save_to_excel(self):
@@ -588,19 +693,18 @@ class MainWindow(QMainWindow):
                                                   "", "Excel Files (*.xlsx)")
         if not filename:
             return
-        conn = self.db.conn
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT date, text, done, category, priority FROM tasks WHERE username=? ORDER BY date",
-            (self.current_user,))
-        rows = cur.fetchall()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Tasks"
-        ws.append(["Дата", "Задача", "Выполнена", "Категория", "Приоритет"])
-        for date_val, text, done, cat, prio in rows:
-            ws.append([date_val, text, "Да" if done else "Нет", cat, prio])
-        wb.save(filename)
+        with self.profiler.action("save_to_excel"):
+            with self.profiler.phase("db"):
+                rows = self.db.iter_tasks(self.current_user).fetchall()
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Tasks"
+            ws.append(["Дата", "Задача", "Выполнена", "Категория",
+                       "Приоритет"])
+            for date_val, text, done, cat, prio in rows:
+                ws.append([date_val, text, "Да" if done else "Нет", cat,
+                           prio])
+            wb.save(filename)
         QMessageBox.information(self, "Успех",
                                 f"Данные успешно сохранены в {filename}")
 
@@ -613,43 +717,51 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Файл не найден!")
             return
         try:
-            wb = load_workbook(filename)
-            ws = wb.active
-            conn = self.db.conn
-            cur = conn.cursor()
-            first = True
-            for row in ws.iter_rows(values_only=True):
-                if first:
-                    first = False
-                    continue
-                date_val, text, done_str, cat, prio = row
-                if not date_val or not text:
-                    continue
-                if isinstance(date_val, datetime):
-                    date_str = date_val.strftime("%Y-%m-%d")
-                else:
-                    date_str = str(date_val)
-                d = QDate.fromString(date_str, "yyyy-MM-dd")
-                if not d.isValid():
-                    continue
-                done = (done_str == "Да")
-                if not cat:
-                    cat = "Все категории"
-                self.db.add_category(self.current_user, cat)
-                if not prio:
-                    prio = "Низкий"
-                cur.execute(
-                    "INSERT INTO tasks (username, date, text, done, category, priority) VALUES (?,?,?,?,?,?)",
-                    (self.current_user, date_str, text, 1 if done else 0, cat,
-                     prio))
-            conn.commit()
-            self.update_category_list()
-            self.update_task_list()
-            QMessageBox.information(self, "Успех",
-                                    f"Данные успешно загружены из {filename}")
+            with self.profiler.action("load_from_excel"):
+                wb = load_workbook(filename, read_only=True)
+                ws = wb.active
+                rows = []
+                invalid = 0
+                first = True
+                for row in ws.iter_rows(values_only=True):
+                    if first:
+                        first = False
+                        continue
+                    if len(row) < 5:
+                        row = tuple(row) + (None,) * (5 - len(row))
+                    date_val, text, done_str, cat, prio = row[:5]
+                    if not date_val or not text:
+                        invalid += 1
+                        continue
+                    if isinstance(date_val, datetime):
+                        date_str = date_val.strftime("%Y-%m-%d")
+                    else:
+                        date_str = str(date_val)
+                    d = QDate.fromString(date_str, "yyyy-MM-dd")
+                    if not d.isValid():
+                        invalid += 1
+                        continue
+                    done = (done_str == "Да")
+                    if not cat:
+                        cat = "Все категории"
+                    if not prio:
+                        prio = "Низкий"
+                    rows.append((date_str, str(text), done, str(cat),
+                                 str(prio)))
+                wb.close()
+                inserted, skipped = self.db.import_tasks(self.current_user,
+                                                         rows)
+                self.invalidate_task_cache()
+                self.request_refresh("categories", "tasks")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка",
                                  f"Не удалось загрузить файл: {e}")
+            return
+        QMessageBox.information(self, "Успех",
+                                f"Данные успешно загружены из {filename}\n"
+                                f"Добавлено: {inserted}\n"
+                                f"Пропущено дубликатов: {skipped}\n"
+                                f"Некорректных строк: {invalid}")
 
     def export_stats_to_excel(self):
         filename, _ = QFileDialog.getSaveFileName(self,
@@ -657,17 +769,22 @@ class MainWindow(QMainWindow):
                                                   "", "Excel Files (*.xlsx)")
         if not filename:
             return
-        total_tasks, done_tasks = self.db.get_stats(self.current_user)
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Stats"
-        ws.append(["Всего задач", "Выполнено задач"])
-        ws.append([total_tasks, done_tasks])
-        wb.save(filename)
+        with self.profiler.action("export_stats_to_excel"):
+            total_tasks, done_tasks = self.db.get_stats(self.current_user)
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Stats"
+            ws.append(["Всего задач", "Выполнено задач"])
+            ws.append([total_tasks, done_tasks])
+            wb.save(filename)
         QMessageBox.information(self, "Успех",
                                 f"Статистика успешно сохранена в {filename}")
 
     def logout(self):
+        self.change_watcher.stop()
+        self.backup_timer.stop()
+        if self.profiler.records:
+            self.profiler.dump()
         self.close()
         main()
 
@@ -691,17 +808,19 @@ class MainWindow(QMainWindow):
                                         12)
         if not ok:
             return
-        rows = self.db.get_monthly_tasks(self.current_user, month)
-        text_result = ""
-        for (date_val, text, done, cat, prio) in rows:
-            status = "[✓]" if done else "[ ]"
-            text_result += f"{date_val}: {status} {text} ({cat}) [{prio}]\n"
-        dlg = QDialog(self)
-        dlg.setWindowTitle("Задачи за месяц")
-        v = QVBoxLayout()
-        v.addWidget(QLabel(
-            text_result if text_result else "Нет задач за выбранный месяц."))
-        dlg.setLayout(v)
+        with self.profiler.action("print_monthly_tasks"):
+            rows = self.db.get_monthly_tasks(self.current_user, month)
+            text_result = ""
+            for (date_val, text, done, cat, prio) in rows:
+                status = "[✓]" if done else "[ ]"
+                text_result += (f"{date_val}: {status} {text} ({cat}) "
+                                f"[{prio}]\n")
+            dlg = QDialog(self)
+            dlg.setWindowTitle("Задачи за месяц")
+            v = QVBoxLayout()
+            v.addWidget(QLabel(text_result if text_result
+                               else "Нет задач за выбранный месяц."))
+            dlg.setLayout(v)
         dlg.exec()
 
     def save_to_text(self):
@@ -709,22 +828,72 @@ class MainWindow(QMainWindow):
                                                   "", "Text Files (*.txt)")
         if not filename:
             return
-        conn = self.db.conn
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT date, text, done, category, priority FROM tasks WHERE username=? ORDER BY date",
-            (self.current_user,))
-        rows = cur.fetchall()
-        lines = []
-        for date_val, text, done, cat, prio in rows:
-            status = "[✓]" if done else "[ ]"
-            lines.append(f"{date_val} | {status} {text} ({cat}) [{prio}]")
-        with open(filename, "w", encoding="utf-8") as f:
-            for line in lines:
-                f.write(line + "\n")
+        with self.profiler.action("save_to_text"):
+            with self.profiler.phase("db"):
+                rows = self.db.iter_tasks(self.current_user).fetchall()
+            lines = []
+            for date_val, text, done, cat, prio in rows:
+                status = "[✓]" if done else "[ ]"
+                lines.append(f"{date_val} | {status} {text} ({cat}) [{prio}]")
+            with open(filename, "w", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(line + "\n")
         QMessageBox.information(self, "Успех",
                                 f"Данные успешно сохранены в {filename}")
 
+    def create_backup(self):
+        with self.profiler.action("create_backup"):
+            started = self.backup_manager.start_backup()
+            if started:
+                self.statusbar.showMessage("Создание резервной копии...")
+                self.backup_poll_timer.start()
+        if not started:
+            QMessageBox.warning(self, "Ошибка",
+                                "Резервное копирование уже выполняется.")
+
+    def start_scheduled_backup(self):
+        with self.profiler.detached():
+            if self.backup_manager.start_backup():
+                self.backup_poll_timer.start()
+
+    def check_backup_finished(self):
+        with self.profiler.detached():
+            if self.backup_manager.is_running():
+                return
+            self.backup_poll_timer.stop()
+            report = self.backup_manager.last_report
+            self.statusbar.showMessage(report.summary())
+            if report.error is not None:
+                QMessageBox.critical(self, "Ошибка", report.summary())
+
+    def restore_backup(self):
+        if self.backup_manager.is_running():
+            QMessageBox.warning(self, "Ошибка",
+                                "Дождитесь окончания резервного копирования.")
+            return
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Восстановить из резервной копии",
+            self.backup_manager.backup_dir, "Database Files (*.db)")
+        if not filename:
+            return
+        reply = QMessageBox.question(self, "Восстановление",
+                                     "Текущие данные будут заменены данными из резервной копии. Продолжить?")
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            with self.profiler.action("restore_backup"):
+                self.backup_manager.restore(filename, self.db)
+                self.change_watcher.reset()
+                self.load_theme()
+                self.invalidate_task_cache()
+                self.request_refresh("categories", "tasks")
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка",
+                                 f"Не удалось восстановить данные: {e}")
+            return
+        QMessageBox.information(self, "Успех",
+                                f"Данные восстановлены из {filename}")
+
     def change_password(self):
         dlg = ChangePasswordDialog(self.db, self.current_user, self)
         dlg.exec()
@@ -734,7 +903,8 @@ class MainWindow(QMainWindow):
                                                   "", "Text Files (*.txt)")
         if not filename:
             return
-        self.db.export_categories(self.current_user, filename)
+        with self.profiler.action("export_categories"):
+            self.db.export_categories(self.current_user, filename)
         QMessageBox.information(self, "Успех",
                                 f"Категории успешно экспортированы в {filename}")
 
@@ -743,23 +913,27 @@ class MainWindow(QMainWindow):
                                                   "Text Files (*.txt)")
         if not filename:
             return
-        self.db.import_categories(self.current_user, filename)
-        self.update_category_list()
-        self.update_task_list()
+        with self.profiler.action("import_categories"):
+            self.db.import_categories(self.current_user, filename)
+            self.request_refresh("categories", "tasks")
         QMessageBox.information(self, "Успех",
                                 f"Категории успешно импортированы из {filename}")
 
+    @profiled
     def delete_all_done_tasks(self):
         date = self.get_selected_date()
         date_str = date.toString("yyyy-MM-dd")
         self.db.delete_all_done_tasks(self.current_user, date_str)
-        self.update_task_list()
+        self.invalidate_task_cache()
+        self.request_refresh("tasks")
 
+    @profiled
     def mark_all_tasks_done(self):
         date = self.get_selected_date()
         date_str = date.toString("yyyy-MM-dd")
         self.db.mark_all_tasks_done(self.current_user, date_str)
-        self.update_task_list()
+        self.invalidate_task_cache()
+        self.request_refresh("tasks")
 
     def change_selected_task_priority(self):
         selected_items = self.tasksListWidget.selectedItems()
@@ -787,8 +961,14 @@ class MainWindow(QMainWindow):
         if not ok:
             return
 
-        self.update_task_in_db(text, done, cat, old_prio, new_prio=new_prio)
-        self.update_task_list()
+        with self.profiler.action("change_selected_task_priority"):
+            updated = self.update_task_in_db(text, done, cat, old_prio,
+                                             new_prio=new_prio)
+            if updated:
+                self.invalidate_task_cache()
+                self.request_refresh("tasks")
+        if not updated:
+            QMessageBox.warning(self, "Ошибка", "Такая задача уже существует!")
 
     def change_selected_task_category(self):
         selected_items = self.tasksListWidget.selectedItems()
@@ -816,44 +996,46 @@ class MainWindow(QMainWindow):
         if not ok or not new_cat:
             return
 
-        self.update_task_in_db(text, done, old_cat, prio, new_cat=new_cat)
-        self.update_task_list()
+        with self.profiler.action("change_selected_task_category"):
+            updated = self.update_task_in_db(text, done, old_cat, prio,
+                                             new_cat=new_cat)
+            if updated:
+                self.invalidate_task_cache()
+                self.request_refresh("tasks")
+        if not updated:
+            QMessageBox.warning(self, "Ошибка", "Такая задача уже существует!")
 
     def update_task_in_db(self, text, done, cat, prio, new_cat=None,
                           new_prio=None):
-        d_val = 1 if done else 0
         date_str = self.get_selected_date().toString("yyyy-MM-dd")
-        conn = self.db.conn
-        cur = conn.cursor()
-
-        updates = []
-        params = []
-        if new_cat is not None:
-            updates.append("category=?")
-            params.append(new_cat)
-        if new_prio is not None:
-            updates.append("priority=?")
-            params.append(new_prio)
-
-        if not updates:
-            return
-
-        set_clause = ", ".join(updates)
-        params.extend([self.current_user, date_str, text, d_val, cat, prio])
-        query = f"UPDATE tasks SET {set_clause} WHERE username=? AND date=? AND text=? AND done=? AND category=? AND priority=?"
-        cur.execute(query, tuple(params))
-        conn.commit()
+        return self.db.update_task_fields(self.current_user, date_str, text,
+                                          done, cat, prio, new_cat=new_cat,
+                                          new_prio=new_prio)
 
 
 def main():
     app = QApplication(sys.argv)
+    passwords.calibrate()
+    profiler = ActionProfiler(
+        enabled="--profile" in sys.argv,
+        capture_cprofile="--profile-cprofile" in sys.argv,
+        capture_memory="--profile-memory" in sys.argv)
     db = Database(DB_FILE)
+    if db.merged_duplicate_tasks:
+        QMessageBox.information(
+            None, "Обновление базы данных",
+            f"Объединено одинаковых задач: {db.merged_duplicate_tasks}.\n"
+            "Из дубликатов сохранена выполненная копия, если она была.\n"
+            f"Копия базы до объединения: {db.migration_snapshot}")
     login_dialog = LoginDialog(db)
     if login_dialog.exec() == QDialog.DialogCode.Accepted:
         username = login_dialog.get_username()
-        window = MainWindow(db, username)
+        window = MainWindow(db, username, profiler)
         window.show()
-        sys.exit(app.exec())
+        exit_code = app.exec()
+        if profiler.records:
+            profiler.dump()
+        sys.exit(exit_code)
     else:
         sys.exit(0)
 
@@ -0,0 +1,61 @@
+import hashlib
+import hmac
+import os
+import time
+
+PBKDF2_ALGORITHM = "pbkdf2_sha256"
+TARGET_SECONDS = 0.25
+MIN_ITERATIONS = 100_000
+MAX_ITERATIONS = 10_000_000
+CALIBRATION_ITERATIONS = 20_000
+SALT_BYTES = 16
+
+iterations = MIN_ITERATIONS
+
+
+def calibrate(target=TARGET_SECONDS):
+    global iterations
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration", b"\0" * SALT_BYTES,
+                        CALIBRATION_ITERATIONS)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    estimate = int(CALIBRATION_ITERATIONS * target / elapsed)
+    iterations = min(MAX_ITERATIONS, max(MIN_ITERATIONS, estimate))
+    return iterations
+
+
+def hash_password(password, rounds=None):
+    rounds = rounds or iterations
+    salt = os.urandom(SALT_BYTES)
+    derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt,
+                                  rounds)
+    return f"{PBKDF2_ALGORITHM}${rounds}${salt.hex()}${derived.hex()}"
+
+
+def verify_password(password, stored):
+    if "$" not in stored:
+        legacy = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        algorithm, rounds, salt_hex, hash_hex = stored.split("$")
+        rounds = int(rounds)
+        salt = bytes.fromhex(salt_hex)
+    except ValueError:
+        return False, False
+    if algorithm != PBKDF2_ALGORITHM:
+        return False, False
+    derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt,
+                                  rounds)
+    ok = hmac.compare_digest(derived.hex(), hash_hex)
+    return ok, ok and rounds * 2 <= iterations
+
+
+def check_login(password, stored):
+    ok, needs_upgrade = verify_password(password, stored)
+    new_hash = hash_password(password) if ok and needs_upgrade else None
+    return ok, new_hash
+
+
+def check_password_change(old_password, new_password, stored):
+    ok, _ = verify_password(old_password, stored)
+    return ok, hash_password(new_password) if ok else None
@@ -0,0 +1,221 @@
+import cProfile
+import csv
+import functools
+import inspect
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = "profile_reports"
+PHASES = ("db", "filter", "widgets")
+MEMORY_TOP = 25
+
+
+class ActionRecord:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self.total = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.profile = None
+        self.memory_peak = None
+        self.memory_top = None
+        self.error = None
+        self.active_phase = None
+        self.paused = 0.0
+
+    def other(self):
+        return max(0.0, self.total - sum(self.phases.values()))
+
+
+class ActionProfiler:
+    def __init__(self, enabled=False, capture_cprofile=False,
+                 capture_memory=False, report_dir=PROFILE_DIR):
+        self.enabled = enabled
+        self.capture_cprofile = capture_cprofile
+        self.capture_memory = capture_memory
+        self.report_dir = report_dir
+        self.records = []
+        self.current = None
+
+    @contextmanager
+    def action(self, name):
+        if not self.enabled or self.current is not None:
+            yield
+            return
+        record = ActionRecord(name)
+        self.current = record
+        profile = None
+        memory = self.capture_memory and not tracemalloc.is_tracing()
+        if memory:
+            tracemalloc.start()
+        if self.capture_cprofile:
+            profile = cProfile.Profile()
+            record.profile = profile
+            profile.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            record.error = repr(e)
+            raise
+        finally:
+            record.total = time.perf_counter() - started - record.paused
+            if profile is not None:
+                profile.disable()
+            if memory:
+                record.memory_peak = tracemalloc.get_traced_memory()[1]
+                record.memory_top = tracemalloc.take_snapshot().statistics(
+                    "lineno")[:MEMORY_TOP]
+                tracemalloc.stop()
+            self.current = None
+            self.records.append(record)
+
+    @contextmanager
+    def phase(self, name):
+        record = self.current
+        if record is None or record.active_phase is not None:
+            yield
+            return
+        record.active_phase = name
+        started = time.perf_counter()
+        paused = record.paused
+        try:
+            yield
+        finally:
+            record.phases[name] += (time.perf_counter() - started
+                                    - (record.paused - paused))
+            record.active_phase = None
+
+    @contextmanager
+    def resume(self, record):
+        if record is None or self.current is not None:
+            yield
+            return
+        self.current = record
+        if record.profile is not None:
+            record.profile.enable()
+        started = time.perf_counter()
+        paused = record.paused
+        try:
+            yield
+        finally:
+            record.total += (time.perf_counter() - started
+                             - (record.paused - paused))
+            if record.profile is not None:
+                record.profile.disable()
+            self.current = None
+
+    @contextmanager
+    def detached(self):
+        record = self.current
+        if record is None:
+            yield
+            return
+        self.current = None
+        if record.profile is not None:
+            record.profile.disable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.paused += time.perf_counter() - started
+            if record.profile is not None:
+                record.profile.enable()
+            self.current = record
+
+    def summary(self):
+        totals = {}
+        for record in self.records:
+            entry = totals.setdefault(record.name, {
+                "count": 0, "total": 0.0, "max": 0.0,
+                **dict.fromkeys(PHASES, 0.0), "other": 0.0})
+            entry["count"] += 1
+            entry["total"] += record.total
+            entry["max"] = max(entry["max"], record.total)
+            for phase in PHASES:
+                entry[phase] += record.phases[phase]
+            entry["other"] += record.other()
+        return sorted(totals.items(), key=lambda item: item[1]["total"],
+                      reverse=True)
+
+    def dump(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.report_dir, f"profile-{stamp}")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "actions.csv"), "w", newline="",
+                  encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["index", "started_at", "action", "total_ms",
+                             *(f"{phase}_ms" for phase in PHASES),
+                             "other_ms", "memory_peak_kb", "error"])
+            for i, record in enumerate(self.records):
+                writer.writerow([
+                    i, record.started_at.isoformat(timespec="milliseconds"),
+                    record.name, f"{record.total * 1000:.3f}",
+                    *(f"{record.phases[phase] * 1000:.3f}"
+                      for phase in PHASES),
+                    f"{record.other() * 1000:.3f}",
+                    "" if record.memory_peak is None
+                    else f"{record.memory_peak / 1024:.1f}",
+                    record.error or ""])
+                if record.profile is not None:
+                    record.profile.dump_stats(
+                        os.path.join(path, f"{i:05d}-{record.name}.prof"))
+                if record.memory_top is not None:
+                    with open(os.path.join(
+                            path, f"{i:05d}-{record.name}-memory.txt"), "w",
+                            encoding="utf-8") as mf:
+                        for stat in record.memory_top:
+                            mf.write(f"{stat}\n")
+        with open(os.path.join(path, "summary.csv"), "w", newline="",
+                  encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["action", "count", "total_ms", "mean_ms",
+                             "max_ms", *(f"{phase}_ms" for phase in PHASES),
+                             "other_ms"])
+            for name, entry in self.summary():
+                writer.writerow([
+                    name, entry["count"], f"{entry['total'] * 1000:.3f}",
+                    f"{entry['total'] / entry['count'] * 1000:.3f}",
+                    f"{entry['max'] * 1000:.3f}",
+                    *(f"{entry[phase] * 1000:.3f}" for phase in PHASES),
+                    f"{entry['other'] * 1000:.3f}"])
+        self.records = []
+        return path
+
+
+class ProfiledDatabase:
+    def __init__(self, db, profiler):
+        self.db = db
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        value = getattr(self.db, name)
+        if not self.profiler.enabled or not inspect.ismethod(value):
+            return value
+
+        @functools.wraps(value)
+        def timed(*args, **kwargs):
+            with self.profiler.phase("db"):
+                return value(*args, **kwargs)
+        return timed
+
+
+def profiled(method):
+    signature = inspect.signature(method)
+    if any(p.kind == p.VAR_POSITIONAL
+           for p in signature.parameters.values()):
+        max_args = None
+    else:
+        max_args = len(signature.parameters) - 1
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        if max_args is not None:
+            args = args[:max_args]
+        with self.profiler.action(method.__name__):
+            return method(self, *args)
+    return wrapper
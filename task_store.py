@@ -0,0 +1,83 @@
+from array import array
+
+
+class TaskStore:
+    def __init__(self):
+        self.texts = []
+        self.done = array("b")
+        self.date_ids = array("I")
+        self.category_ids = array("I")
+        self.priority_ids = array("I")
+        self.dates = []
+        self.categories = []
+        self.priorities = []
+        self.date_index = {}
+        self.category_index = {}
+        self.priority_index = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls()
+        for date_str, text, done, cat, prio in rows:
+            store.append(date_str, text, done, cat, prio)
+        return store
+
+    def intern(self, values, index, value):
+        value_id = index.get(value)
+        if value_id is None:
+            value_id = len(values)
+            values.append(value)
+            index[value] = value_id
+        return value_id
+
+    def append(self, date_str, text, done, category, priority):
+        self.texts.append(text)
+        self.done.append(1 if done else 0)
+        self.date_ids.append(self.intern(self.dates, self.date_index,
+                                         date_str))
+        self.category_ids.append(self.intern(self.categories,
+                                             self.category_index, category))
+        self.priority_ids.append(self.intern(self.priorities,
+                                             self.priority_index, priority))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def date(self, i):
+        return self.dates[self.date_ids[i]]
+
+    def category(self, i):
+        return self.categories[self.category_ids[i]]
+
+    def priority(self, i):
+        return self.priorities[self.priority_ids[i]]
+
+    def select(self, date_str=None, category=None, priority=None,
+               search=None):
+        checks = []
+        for value, index, column in (
+                (date_str, self.date_index, self.date_ids),
+                (category, self.category_index, self.category_ids),
+                (priority, self.priority_index, self.priority_ids)):
+            if value is None:
+                continue
+            value_id = index.get(value)
+            if value_id is None:
+                return array("I")
+            checks.append((column, value_id))
+        result = None
+        for column, value_id in checks:
+            if result is None:
+                result = [i for i, v in enumerate(column) if v == value_id]
+            else:
+                result = [i for i in result if column[i] == value_id]
+        texts = self.texts
+        if search:
+            if result is None:
+                result = [i for i, text in enumerate(texts)
+                          if search in text.lower()]
+            else:
+                result = [i for i in result if search in texts[i].lower()]
+        if result is None:
+            result = range(len(texts))
+        return array("I", result)
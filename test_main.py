@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+pytest.importorskip("openpyxl")
+
+from database import Database
+from main import MainWindow
+
+USERNAME = "tester"
+
+
+@pytest.fixture(scope="module")
+def app():
+    return (QtWidgets.QApplication.instance()
+            or QtWidgets.QApplication([]))
+
+
+@pytest.fixture
+def window(app, tmp_path, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    db = Database(str(tmp_path / "diary.db"))
+    db.add_user(USERNAME, "x")
+    db.add_category(USERNAME, "Работа")
+    db.add_task(USERNAME, "2024-05-01", "Отчёт", "Работа", "Низкий")
+    window = MainWindow(db, USERNAME)
+    window.change_watcher.stop()
+    window.backup_timer.stop()
+    yield window
+    window.close()
+    db.conn.close()
+
+
+def test_delete_category_rebuilds_each_view_once(app, window):
+    window.categoryComboBox.setCurrentText("Работа")
+    app.processEvents()
+    window.refresh_scheduler.rebuild_counts = dict.fromkeys(
+        window.refresh_scheduler.rebuild_counts, 0)
+
+    window.delete_category()
+    app.processEvents()
+
+    assert window.refresh_scheduler.rebuild_counts == {"categories": 1,
+                                                       "tasks": 1}